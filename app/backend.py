@@ -1,31 +1,62 @@
 # app/backend.py
-from fastapi import FastAPI, UploadFile, HTTPException, Query
+from fastapi import FastAPI, UploadFile, HTTPException, Query, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import datetime
+import json
 import shutil
 import os
 import time
+import uuid
+import hmac
 from typing import Optional
 
 from app.document_loader import AdvancedDocumentLoader
-from app.embedder import AdvancedEmbedder
-from app.vector_store import AdvancedVectorStore
-from app.llm_model import LLM
+from app.vector_store import AdvancedVectorStore, validate_namespace
 from app.utils import GPUMonitor
+from app.profiling import profiler
+
+# Stub models for offline load testing (see app/loadtest.py)
+if os.environ.get("RAG_STUB_MODELS"):
+    from app.stubs import StubEmbedder as AdvancedEmbedder, StubLLM as LLM
+else:
+    from app.embedder import AdvancedEmbedder
+    from app.llm_model import LLM
 
 # Request models
 class QueryRequest(BaseModel):
     query: str
     filename_filter: Optional[str] = None
+    namespace: Optional[str] = None
+
+class ProfilingSettings(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    torch_trace: Optional[bool] = None
+    max_sessions: Optional[int] = None
+
+NO_RESULTS_ANSWER = "No relevant information found in the documents."
+# Uploads are kept outside data/ so `python -m app.ingest data/` doesn't index them a second time
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
 
 # Initialize components
 app = FastAPI(title="Advanced RAG Chatbot", version="2.0")
 loader = AdvancedDocumentLoader()
 embedder = AdvancedEmbedder()
-vector_store = AdvancedVectorStore()
 llm = LLM()
 gpu_monitor = GPUMonitor()
 
+# Vector index backend: Qdrant by default, memory-mapped flat index with VECTOR_INDEX=flat
+if os.environ.get("VECTOR_INDEX") == "flat":
+    from app.flat_index import FlatVectorStore
+    vector_store = FlatVectorStore(
+        os.environ.get("FLAT_INDEX_PATH", "flat_index"),
+        dtype=os.environ.get("FLAT_INDEX_DTYPE", "float32")
+    )
+else:
+    vector_store = AdvancedVectorStore(path=os.environ.get("QDRANT_PATH"))
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,108 +65,185 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _check_namespace(namespace: Optional[str]):
+    """Reject namespaces that are not plain identifiers"""
+    try:
+        validate_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _descriptive_path(original_filename: Optional[str]) -> str:
+    """Always use a descriptive, unique filename to avoid 'file' issues and collisions"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    original_filename = original_filename or ""
+    file_extension = os.path.splitext(original_filename)[1] if '.' in original_filename else '.pdf'
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(UPLOAD_DIR, f"document_{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}")
+
+def _document_name(original_filename: Optional[str], file_path: str) -> str:
+    """Name a document is indexed (and replaced/deleted) under.
+
+    The original filename, so re-uploading a file replaces its previous version;
+    the unique stored name when the client did not send a usable filename.
+    """
+    original_filename = os.path.basename(original_filename or "")
+    if '.' in original_filename and original_filename != "file":
+        return original_filename
+    return os.path.basename(file_path)
+
+def _index_document(file_path: str, document_name: str, namespace: Optional[str] = None) -> dict:
+    """Chunk, embed and index a saved document"""
+    with profiler.stage("chunk"):
+        chunks = loader.load_and_chunk_documents(file_path)
+    
+    if not chunks:
+        raise HTTPException(status_code=400, detail="No content extracted from document")
+    
+    for chunk in chunks:
+        chunk["metadata"]["filename"] = document_name
+    
+    # Debug: Print the first chunk's filename
+    print(f"First chunk filename: {chunks[0]['metadata']['filename']}")
+    
+    # Create embeddings
+    texts = [chunk["text"] for chunk in chunks]
+    embeddings = embedder.embed_documents(texts)
+    
+    # Add to vector store
+    with profiler.stage("index"):
+        vector_store.add_documents(chunks, embeddings, namespace=namespace)
+    
+    # Monitor GPU usage
+    gpu_stats = gpu_monitor.get_stats()
+    
+    return {
+        "message": f"Document processed successfully. {len(chunks)} chunks indexed.",
+        "filename": document_name,
+        "chunks_count": len(chunks),
+        "gpu_usage": gpu_stats
+    }
+
+# Profiling admin API and X-Profile are disabled unless an admin token is configured
+PROFILING_ADMIN_TOKEN = os.environ.get("PROFILING_ADMIN_TOKEN", "")
+
+def _is_profiling_admin(x_admin_token: Optional[str]) -> bool:
+    return bool(PROFILING_ADMIN_TOKEN) and hmac.compare_digest(x_admin_token or "", PROFILING_ADMIN_TOKEN)
+
+def _require_profiling_admin(x_admin_token: Optional[str] = Header(None)):
+    if not _is_profiling_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Profiling admin access denied")
+
+def _profile_requested(x_profile: Optional[str], x_admin_token: Optional[str]) -> bool:
+    """X-Profile: 1 forces profiling of a single request, only together with a valid X-Admin-Token"""
+    return (x_profile or "").lower() in ("1", "true", "yes") and _is_profiling_admin(x_admin_token)
+
 @app.post("/upload/")
-async def upload_document(file: UploadFile):
+async def upload_document(file: UploadFile, namespace: Optional[str] = Query(None),
+                          x_profile: Optional[str] = Header(None),
+                          x_admin_token: Optional[str] = Header(None)):
     """Upload and process document"""
+    _check_namespace(namespace)
     try:
         # Save uploaded file
-        os.makedirs("data", exist_ok=True)
-        
-        # Always use a descriptive filename to avoid 'file' issues
-        file_extension = os.path.splitext(file.filename)[1] if '.' in file.filename else '.pdf'
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        descriptive_name = f"document_{timestamp}{file_extension}"
-        file_path = f"data/{descriptive_name}"
+        file_path = _descriptive_path(file.filename)
         
         # Debug: Print the actual filename
         print(f"Uploading file: {file.filename}")
-        print(f"Using descriptive name: {descriptive_name}")
         print(f"File path: {file_path}")
         
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Process document
-        chunks = loader.load_and_chunk_documents(file_path)
-        
-        if not chunks:
-            raise HTTPException(status_code=400, detail="No content extracted from document")
-        
-        # Debug: Print the first chunk's filename
-        if chunks:
-            print(f"First chunk filename: {chunks[0]['metadata']['filename']}")
-        
-        # Create embeddings
-        texts = [chunk["text"] for chunk in chunks]
-        embeddings = embedder.embed_documents(texts)
-        
-        # Add to vector store
-        vector_store.add_documents(chunks, embeddings)
-        
-        # Monitor GPU usage
-        gpu_stats = gpu_monitor.get_stats()
-        
-        return {
-            "message": f"Document processed successfully. {len(chunks)} chunks indexed.",
-            "chunks_count": len(chunks),
-            "gpu_usage": gpu_stats
-        }
+        with profiler.session("upload", force=_profile_requested(x_profile, x_admin_token)):
+            return _index_document(file_path, _document_name(file.filename, file_path), namespace)
         
     except Exception as e:
         print(f"Upload error: {str(e)}")  # Debug print
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
-@app.post("/ask/")
-async def ask_question(request: QueryRequest):
-    """Answer question based on uploaded documents"""
+@app.post("/upload/stream/")
+async def upload_document_stream(request: Request, filename: Optional[str] = Query(None),
+                                 namespace: Optional[str] = Query(None),
+                                 x_profile: Optional[str] = Header(None),
+                                 x_admin_token: Optional[str] = Header(None)):
+    """Upload a document sent as a raw (chunked) request body and process it"""
+    _check_namespace(namespace)
     try:
-        start_time = time.time()
+        file_path = _descriptive_path(filename)
         
-        # Embed query
-        query_embedding = embedder.embed_query(request.query)
+        # Write chunks to disk as they arrive instead of buffering the whole file
+        with open(file_path, "wb") as buffer:
+            async for chunk in request.stream():
+                buffer.write(chunk)
         
-        # Search for relevant chunks
+        with profiler.session("upload", force=_profile_requested(x_profile, x_admin_token)):
+            return _index_document(file_path, _document_name(filename, file_path), namespace)
+        
+    except Exception as e:
+        print(f"Upload error: {str(e)}")  # Debug print
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+
+def _retrieve_contexts(request: QueryRequest):
+    """Embed the query and fetch contexts plus formatted sources (single vector DB query)"""
+    # Embed query
+    query_embedding = embedder.embed_query(request.query)
+    
+    # Search for relevant chunks
+    with profiler.stage("vector_search"):
         hits = vector_store.search(
             query_embedding, 
             top_k=1,  # Changed from 5 to 1 to get only the most relevant source
-            filename_filter=request.filename_filter
+            filename_filter=request.filename_filter,
+            namespace=request.namespace
         )
+    
+    # Prepare contexts for LLM (simplified format)
+    contexts = []
+    sources = []
+    for hit in hits:
+        base_filename = os.path.splitext(hit.payload['filename'])[0]
+        contexts.append({
+            "text": hit.payload["text"],
+            "source_id": f"{base_filename} | page {hit.payload['page']} | chunk #{hit.payload['chunk_id']}"
+        })
+        sources.append(f"{base_filename} | page {hit.payload['page']} | chunk #{hit.payload['chunk_id']}")
+    
+    # Deduplicate sources while preserving order
+    unique_sources = list(dict.fromkeys(sources))
+    sources_str = "\n".join([f"• {src}" for src in unique_sources])
+    
+    return contexts, sources_str
+
+def _estimate_confidence(answer: str) -> float:
+    """Calculate simple confidence based on answer length and content"""
+    confidence = 0.5  # Default confidence
+    if "Answer not found in the document" not in answer:
+        confidence = min(0.9, 0.5 + len(answer.split()) / 100)
+    return confidence
+
+@app.post("/ask/")
+async def ask_question(request: QueryRequest, x_profile: Optional[str] = Header(None),
+                       x_admin_token: Optional[str] = Header(None)):
+    """Answer question based on uploaded documents"""
+    _check_namespace(request.namespace)
+    try:
+        start_time = time.time()
         
-        if not hits:
-            return {
-                "answer": "No relevant information found in the documents.",
-                "sources": "",
-                "confidence": 0.0,
-                "response_time": time.time() - start_time
-            }
-        
-        # Prepare contexts for LLM (simplified format)
-        contexts = []
-        sources = []
-        for hit in hits:
-            base_filename = os.path.splitext(hit.payload['filename'])[0]
-            contexts.append({
-                "text": hit.payload["text"],
-                "source_id": f"{base_filename} | page {hit.payload['page']} | chunk #{hit.payload['chunk_id']}"
-            })
-            sources.append(f"{base_filename} | page {hit.payload['page']} | chunk #{hit.payload['chunk_id']}")
-        
-        # Deduplicate sources while preserving order
-        unique_sources = list(dict.fromkeys(sources))
-        sources_str = "\n".join([f"• {src}" for src in unique_sources])
-        
-        # Generate answer using current LLM interface
-        answer = llm.generate_answer(request.query, contexts)
-        
-        # Format sources as bulleted list
-        # sources_str = "\n".join([f"• {source}" for source in sources]) # This line is now redundant as sources_str is calculated above
-        
-        # Calculate simple confidence based on answer length and content
-        confidence = 0.5  # Default confidence
-        if "Answer not found in the document" not in answer:
-            confidence = min(0.9, 0.5 + len(answer.split()) / 100)
+        with profiler.session("ask", force=_profile_requested(x_profile, x_admin_token)):
+            contexts, sources_str = _retrieve_contexts(request)
+            
+            if not contexts:
+                return {
+                    "answer": NO_RESULTS_ANSWER,
+                    "sources": "",
+                    "confidence": 0.0,
+                    "response_time": time.time() - start_time
+                }
+            
+            # Generate answer using current LLM interface
+            answer = llm.generate_answer(request.query, contexts)
         
+        confidence = _estimate_confidence(answer)
         response_time = time.time() - start_time
         gpu_stats = gpu_monitor.get_stats()
         
@@ -150,6 +258,108 @@ async def ask_question(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
 
+@app.post("/ask/stream/")
+def ask_question_stream(request: QueryRequest, x_profile: Optional[str] = Header(None),
+                        x_admin_token: Optional[str] = Header(None)):
+    """Answer question as newline-delimited JSON events, streaming tokens as they are generated"""
+    _check_namespace(request.namespace)
+    start_time = time.time()
+    # The response body is produced across worker threads, so the session is
+    # re-activated around each step instead of spanning the generator's yields
+    session = profiler.start("ask_stream", force=_profile_requested(x_profile, x_admin_token))
+    try:
+        with profiler.activate(session):
+            contexts, sources_str = _retrieve_contexts(request)
+    except Exception as e:
+        profiler.finish(session)
+        raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
+    
+    def event_stream():
+        try:
+            yield json.dumps({"type": "sources", "sources": sources_str}) + "\n"
+            
+            if not contexts:
+                answer = NO_RESULTS_ANSWER
+                confidence = 0.0
+                yield json.dumps({"type": "token", "text": answer}) + "\n"
+            else:
+                try:
+                    pieces = []
+                    stream = llm.generate_answer_stream(request.query, contexts)
+                    while True:
+                        with profiler.activate(session):
+                            text = next(stream, None)
+                        if text is None:
+                            break
+                        pieces.append(text)
+                        yield json.dumps({"type": "token", "text": text}) + "\n"
+                except Exception as e:
+                    yield json.dumps({"type": "error", "detail": f"Error generating answer: {str(e)}"}) + "\n"
+                    return
+                with profiler.activate(session), profiler.stage("postprocess"):
+                    answer = llm.clean_answer("".join(pieces))
+                confidence = _estimate_confidence(answer)
+            
+            # Final event carries the cleaned answer and the same fields as /ask/
+            yield json.dumps({
+                "type": "done",
+                "answer": answer,
+                "sources": sources_str,
+                "confidence": confidence,
+                "response_time": time.time() - start_time,
+                "gpu_usage": gpu_monitor.get_stats()
+            }) + "\n"
+        finally:
+            profiler.finish(session)
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.get("/documents")
+async def list_documents(namespace: Optional[str] = Query(None)):
+    """List indexed documents"""
+    _check_namespace(namespace)
+    documents = vector_store.list_documents(namespace=namespace)
+    return {
+        "documents": documents,
+        "count": len(documents)
+    }
+
+@app.delete("/documents/{name:path}")
+async def delete_document(name: str, namespace: Optional[str] = Query(None)):
+    """Remove a document and all of its chunks from the index"""
+    _check_namespace(namespace)
+    try:
+        removed = vector_store.delete_document(name, namespace=namespace)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Document not found: {name}")
+    
+    return {
+        "message": f"Document deleted. {removed} chunks removed.",
+        "filename": name,
+        "chunks_removed": removed
+    }
+
+@app.get("/admin/profiling", dependencies=[Depends(_require_profiling_admin)])
+async def get_profiling():
+    """Profiling settings and top hot functions per stage over recent sessions"""
+    return {
+        "settings": profiler.settings(),
+        "summary": profiler.summary()
+    }
+
+@app.post("/admin/profiling", dependencies=[Depends(_require_profiling_admin)])
+async def configure_profiling(settings: ProfilingSettings):
+    """Toggle profiling and adjust sampling at runtime"""
+    try:
+        return {"settings": profiler.configure(**settings.model_dump())}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/profiling/sessions", dependencies=[Depends(_require_profiling_admin)])
+async def list_profiling_sessions():
+    """Per-session stage timings and hot functions, newest first"""
+    return {"sessions": list(reversed(profiler.recent))}
+
 @app.get("/health/")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,110 @@
+# app/bench_vector_store.py
+"""Benchmark the memory-mapped flat index against the in-memory Qdrant path.
+
+Usage:
+    python -m app.bench_vector_store --chunks 20000 --queries 200
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.flat_index import FlatVectorStore
+from app.vector_store import AdvancedVectorStore
+
+def make_corpus(num_chunks: int, num_files: int, dim: int, seed: int = 0):
+    """Random clustered embeddings with chunk metadata spread over several files"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_files, dim))
+    file_ids = np.sort(rng.integers(0, num_files, num_chunks))
+    embeddings = centers[file_ids] + 0.5 * rng.standard_normal((num_chunks, dim))
+    embeddings = (embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)).astype(np.float32)
+    chunks = [
+        {
+            "text": f"synthetic chunk {i} " * 8,
+            "metadata": {"filename": f"doc_{file_id}.pdf", "page": 1, "chunk_id": i}
+        }
+        for i, file_id in enumerate(file_ids)
+    ]
+    return chunks, embeddings
+
+def time_queries(store, queries: np.ndarray, top_k: int, filename_filter=None) -> Dict:
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(store.search(query, top_k=top_k, filename_filter=filename_filter))
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p95_ms": np.percentile(latencies, 95) * 1000,
+        "qps": len(queries) / sum(latencies),
+        "results": results
+    }
+
+def overlap(a: List, b: List) -> float:
+    """Fraction of queries whose top hit is the same chunk in both stores"""
+    same = sum(
+        1 for x, y in zip(a, b)
+        if x and y and x[0].payload["chunk_id"] == y[0].payload["chunk_id"]
+    )
+    return same / max(1, sum(1 for x in a if x))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flat index vs Qdrant")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+    
+    dim = 384
+    chunks, embeddings = make_corpus(args.chunks, args.files, dim)
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.integers(0, args.chunks, args.queries)] + 0.1 * rng.standard_normal((args.queries, dim))
+    queries = queries.astype(np.float32)
+    filename_filter = chunks[0]["metadata"]["filename"]
+    
+    index_dir = tempfile.mkdtemp(prefix="flat_index_bench_")
+    try:
+        start = time.perf_counter()
+        qdrant = AdvancedVectorStore(collection_name="bench")
+        qdrant.add_documents(chunks, embeddings)
+        qdrant_add = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        flat = FlatVectorStore(index_dir, dim=dim, dtype=args.dtype)
+        flat.add_documents(chunks, embeddings)
+        flat_add = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        flat = FlatVectorStore(index_dir, dim=dim, dtype=args.dtype)
+        flat_reload = time.perf_counter() - start
+        
+        rows = {
+            "qdrant": time_queries(qdrant, queries, args.top_k),
+            "flat": time_queries(flat, queries, args.top_k),
+            "qdrant (filtered)": time_queries(qdrant, queries, args.top_k, filename_filter),
+            "flat (filtered)": time_queries(flat, queries, args.top_k, filename_filter),
+        }
+        
+        start = time.perf_counter()
+        flat.search_batch(queries, top_k=args.top_k)
+        batch_elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+    
+    print(f"Corpus: {args.chunks} chunks x {dim} dims in {args.files} files, {args.queries} queries, flat dtype {args.dtype}")
+    print(f"Indexing: qdrant {qdrant_add:.2f}s, flat {flat_add:.2f}s (reload {flat_reload * 1000:.1f} ms)\n")
+    print(f"{'backend':<20} {'p50':>9} {'p95':>9} {'qps':>9}")
+    for name, row in rows.items():
+        print(f"{name:<20} {row['p50_ms']:>7.2f}ms {row['p95_ms']:>7.2f}ms {row['qps']:>9.1f}")
+    print(f"{'flat (batched)':<20} {'':>9} {'':>9} {args.queries / batch_elapsed:>9.1f}")
+    print(f"\nTop-1 agreement with Qdrant: {overlap(rows['qdrant']['results'], rows['flat']['results']) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
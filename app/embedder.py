@@ -4,6 +4,8 @@ import torch
 import numpy as np
 from typing import List
 
+from app.profiling import profiler
+
 class AdvancedEmbedder:
     def __init__(self, model_name='all-MiniLM-L6-v2'):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -20,11 +22,12 @@ class AdvancedEmbedder:
         
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
-            batch_embeddings = self.model.encode(
-                batch, 
-                convert_to_tensor=True,
-                show_progress_bar=False
-            )
+            with profiler.stage("encode_documents", torch_trace=True):
+                batch_embeddings = self.model.encode(
+                    batch, 
+                    convert_to_tensor=True,
+                    show_progress_bar=False
+                )
             embeddings.append(batch_embeddings.cpu())
             
             # Clear GPU cache between batches
@@ -36,13 +39,15 @@ class AdvancedEmbedder:
     def embed_query(self, query: str) -> np.ndarray:
         """Embed a single query with optimization"""
         # Query preprocessing for better retrieval
-        processed_query = self._preprocess_query(query)
+        with profiler.stage("preprocess_query"):
+            processed_query = self._preprocess_query(query)
         
-        embedding = self.model.encode(
-            processed_query, 
-            convert_to_tensor=True,
-            show_progress_bar=False
-        )
+        with profiler.stage("encode_query", torch_trace=True):
+            embedding = self.model.encode(
+                processed_query, 
+                convert_to_tensor=True,
+                show_progress_bar=False
+            )
         
         return embedding.cpu()
     
@@ -0,0 +1,383 @@
+# app/flat_index.py
+"""Memory-mapped flat vector index, an alternative to Qdrant for small and medium corpora.
+
+Each namespace is a directory holding:
+    meta.json       vector dim and dtype the segment was written with
+    vectors.bin     contiguous normalized float32/float16 rows, append-only
+    payloads.jsonl  one payload per row, append-only
+    documents.json  registry: filename -> row range, chunk count, upload time
+
+A document's chunks are appended as one contiguous row range, so filename filters
+only score that slice. Deleted or replaced documents leave dead rows that are
+masked out of searches; appends and deletes never rewrite existing rows.
+Once dead rows exceed ``compact_ratio`` of a segment, ``compact`` rewrites the
+live rows to new files and swaps them in.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.vector_store import AdvancedVectorStore, NAMESPACE_PATTERN, validate_namespace
+
+SCORE_BLOCK_ROWS = 16384  # rows upcast at once when scoring float16 vectors
+COMPACT_SUFFIX = ".compact"  # staged files of a compaction that has not been swapped in yet
+
+@dataclass
+class FlatHit:
+    """Search hit with the same attributes the backend reads from Qdrant hits"""
+    id: int
+    score: float
+    payload: Dict = field(default_factory=dict)
+
+class _FlatSegment:
+    """Vectors, payloads and registry of a single namespace"""
+
+    def __init__(self, directory: str, dim: int, dtype: np.dtype):
+        self.directory = directory
+        self.dim = dim
+        self.dtype = dtype
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.vectors_path = os.path.join(directory, "vectors.bin")
+        self.payloads_path = os.path.join(directory, "payloads.jsonl")
+        self.documents_path = os.path.join(directory, "documents.json")
+        os.makedirs(directory, exist_ok=True)
+        self._check_meta()
+        self._finish_compaction()
+
+        self.documents: Dict[str, Dict] = {}
+        if os.path.exists(self.documents_path):
+            with open(self.documents_path, "r", encoding="utf-8") as f:
+                self.documents = json.load(f)
+
+        self.payloads = self._load_payloads()
+
+        # A crash mid-append can leave a partial trailing vector row: cut only that
+        self.row_bytes = self.dim * self.dtype.itemsize
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if vector_bytes % self.row_bytes:
+            vector_bytes -= vector_bytes % self.row_bytes
+            os.truncate(self.vectors_path, vector_bytes)
+        vector_rows = vector_bytes // self.row_bytes
+
+        # Vectors are written before payloads, so there can never be more payloads than vectors.
+        # Extra vector rows from an interrupted append are uncommitted and get overwritten by the next one
+        if len(self.payloads) > vector_rows:
+            raise ValueError(
+                f"Corrupted flat index segment {directory}: "
+                f"{len(self.payloads)} payloads but only {vector_rows} vectors"
+            )
+        self.count = len(self.payloads)
+
+        self.alive = np.zeros(self.count, dtype=bool)
+        for entry in self.documents.values():
+            self.alive[entry["start"]:entry["end"]] = True
+        self._map()
+
+    def _check_meta(self):
+        """Refuse to open a segment written with another dim/dtype, which would misread every row"""
+        meta = {"dim": self.dim, "dtype": self.dtype.name}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored != meta:
+                raise ValueError(
+                    f"Flat index segment {self.directory} was written with dim={stored.get('dim')}, "
+                    f"dtype={stored.get('dtype')}; cannot open it with dim={self.dim}, dtype={self.dtype.name}"
+                )
+            return
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > 0:
+            raise ValueError(f"Flat index segment {self.directory} has vectors but no meta.json")
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def _finish_compaction(self):
+        """Roll an interrupted compaction forward, or discard it if it was never fully staged.
+
+        The staged registry is written after the staged vectors and payloads, so its
+        presence means all three files are complete and only the swap was interrupted.
+        """
+        staged_documents = self.documents_path + COMPACT_SUFFIX
+        if os.path.exists(staged_documents):
+            for path in (self.vectors_path, self.payloads_path):
+                if os.path.exists(path + COMPACT_SUFFIX):
+                    os.replace(path + COMPACT_SUFFIX, path)
+            os.replace(staged_documents, self.documents_path)
+            return
+        for path in (self.vectors_path, self.payloads_path):
+            if os.path.exists(path + COMPACT_SUFFIX):
+                os.remove(path + COMPACT_SUFFIX)
+
+    def _load_payloads(self) -> List[Dict]:
+        """Read committed payload lines, dropping a partial trailing line left by an interrupted append"""
+        payloads: List[Dict] = []
+        if not os.path.exists(self.payloads_path):
+            return payloads
+
+        valid_bytes = 0
+        with open(self.payloads_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    payloads.append(json.loads(line))
+                except ValueError:
+                    if f.read(1):
+                        raise ValueError(f"Corrupted payload line in {self.payloads_path} at byte {valid_bytes}")
+                    os.truncate(self.payloads_path, valid_bytes)
+                    break
+                valid_bytes += len(line)
+        return payloads
+
+    def _map(self):
+        """(Re)open the memory map over the committed rows"""
+        if self.count == 0:
+            self.vectors = np.zeros((0, self.dim), dtype=self.dtype)
+        else:
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(self.count, self.dim))
+
+    def _save_documents(self):
+        tmp_path = f"{self.documents_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.documents, f)
+        os.replace(tmp_path, self.documents_path)
+
+    def append(self, filename: str, vectors: np.ndarray, payloads: List[Dict], uploaded_at: float):
+        """Append one document's rows without rewriting existing data"""
+        start = self.count
+        # Write right after the committed rows, over any left by an interrupted append
+        with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+            f.seek(start * self.row_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+        with open(self.payloads_path, "a", encoding="utf-8") as f:
+            for payload in payloads:
+                f.write(json.dumps(payload) + "\n")
+
+        self.count += len(payloads)
+        self.payloads.extend(payloads)
+        self.alive = np.concatenate([self.alive, np.ones(len(payloads), dtype=bool)])
+        self.documents[filename] = {
+            "start": start,
+            "end": self.count,
+            "chunk_count": len(payloads),
+            "uploaded_at": uploaded_at
+        }
+        # The registry is written last so it only ever references committed rows
+        self._save_documents()
+        self._map()
+
+    def delete(self, filename: str) -> int:
+        entry = self.documents.pop(filename)
+        self.alive[entry["start"]:entry["end"]] = False
+        self._save_documents()
+        return entry["chunk_count"]
+
+    @property
+    def dead_rows(self) -> int:
+        return self.count - int(self.alive.sum())
+
+    def compact(self) -> int:
+        """Rewrite only the live rows to new files and swap them in, returns the number of reclaimed rows"""
+        dead_rows = self.dead_rows
+        if dead_rows == 0:
+            return 0
+
+        documents: Dict[str, Dict] = {}
+        payloads: List[Dict] = []
+        with open(self.vectors_path + COMPACT_SUFFIX, "wb") as vectors_file, \
+                open(self.payloads_path + COMPACT_SUFFIX, "w", encoding="utf-8") as payloads_file:
+            for filename, entry in sorted(self.documents.items(), key=lambda item: item[1]["start"]):
+                start, end = entry["start"], entry["end"]
+                vectors_file.write(np.ascontiguousarray(self.vectors[start:end]).tobytes())
+                for payload in self.payloads[start:end]:
+                    payloads_file.write(json.dumps(payload) + "\n")
+                documents[filename] = {**entry, "start": len(payloads), "end": len(payloads) + end - start}
+                payloads.extend(self.payloads[start:end])
+
+        # Staging the registry marks the compaction complete, see _finish_compaction
+        tmp_path = f"{self.documents_path}{COMPACT_SUFFIX}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(documents, f)
+        os.replace(tmp_path, self.documents_path + COMPACT_SUFFIX)
+        self._finish_compaction()
+
+        # New objects rather than in-place updates: searches may still hold the old ones
+        self.documents = documents
+        self.payloads = payloads
+        self.count = len(payloads)
+        self.alive = np.ones(self.count, dtype=bool)
+        self._map()
+        return dead_rows
+
+def _score_rows(rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Cosine scores of normalized rows against (m, dim) queries, shape (rows, m)"""
+    if rows.dtype == np.float32:
+        return rows @ queries.T
+    # float16 has no BLAS path, upcast in blocks to bound temporary memory
+    out = np.empty((rows.shape[0], queries.shape[0]), dtype=np.float32)
+    for i in range(0, rows.shape[0], SCORE_BLOCK_ROWS):
+        out[i:i + SCORE_BLOCK_ROWS] = rows[i:i + SCORE_BLOCK_ROWS].astype(np.float32) @ queries.T
+    return out
+
+class FlatVectorStore:
+    """Drop-in replacement for AdvancedVectorStore backed by memory-mapped NumPy arrays"""
+
+    def __init__(self, path: str = "flat_index", dim: int = 384, dtype: str = "float32",
+                 score_threshold: float = 0.3, compact_ratio: Optional[float] = 0.3):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported dtype: {dtype}. Supported dtypes: float32, float16")
+        self.score_threshold = score_threshold
+        self.compact_ratio = compact_ratio  # None disables automatic compaction
+        self.segments: Dict[str, _FlatSegment] = {}
+        self._lock = threading.Lock()
+
+        # Open persisted namespaces up front; memory maps make this cheap
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name == "_default" or not os.path.isdir(os.path.join(path, name)):
+                continue
+            if NAMESPACE_PATTERN.match(name):
+                self._segment(name, create=True)
+        self._segment(None, create=True)
+
+    def _segment(self, namespace: Optional[str] = None, create: bool = False) -> Optional[_FlatSegment]:
+        """Resolve the segment backing a namespace (one directory per tenant)"""
+        name = validate_namespace(namespace) or "_default"
+        if name not in self.segments:
+            if not create:
+                return None
+            self.segments[name] = _FlatSegment(os.path.join(self.path, name), self.dim, self.dtype)
+        return self.segments[name]
+
+    def _normalize(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _maybe_compact(self, segment: _FlatSegment):
+        """Compact a segment once its dead rows exceed compact_ratio (caller holds the lock)"""
+        if self.compact_ratio is not None and segment.count and segment.dead_rows / segment.count > self.compact_ratio:
+            segment.compact()
+
+    def add_documents(self, chunks: List[Dict], embeddings, namespace: Optional[str] = None):
+        """Add documents, replacing any previous version of the same file"""
+        vectors = self._normalize(embeddings)
+        uploaded_at = time.time()
+
+        # Group chunks per file so each document occupies one contiguous row range
+        by_file: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(chunks):
+            by_file.setdefault(chunk["metadata"]["filename"], []).append(i)
+
+        with self._lock:
+            segment = self._segment(namespace, create=True)
+            for filename, indices in by_file.items():
+                if filename in segment.documents:
+                    segment.delete(filename)
+                payloads = [
+                    {
+                        **chunks[i]["metadata"],
+                        "text": chunks[i]["text"],
+                        "text_length": len(chunks[i]["text"]),
+                        "word_count": len(chunks[i]["text"].split()),
+                        "uploaded_at": uploaded_at
+                    }
+                    for i in indices
+                ]
+                segment.append(filename, vectors[indices], payloads, uploaded_at)
+            self._maybe_compact(segment)
+
+    def delete_document(self, filename: str, namespace: Optional[str] = None) -> int:
+        """Delete all rows of a document, returns the number of removed chunks"""
+        with self._lock:
+            segment = self._segment(namespace)
+            if segment is None or filename not in segment.documents:
+                raise KeyError(filename)
+            chunk_count = segment.delete(filename)
+            self._maybe_compact(segment)
+            return chunk_count
+
+    def compact(self, namespace: Optional[str] = None) -> int:
+        """Reclaim dead rows of a namespace now, returns the number of removed rows"""
+        with self._lock:
+            segment = self._segment(namespace)
+            return segment.compact() if segment is not None else 0
+
+    def list_documents(self, namespace: Optional[str] = None) -> List[Dict]:
+        """List indexed documents with chunk count and upload time"""
+        segment = self._segment(namespace)
+        if segment is None:
+            return []
+
+        return [
+            {
+                "filename": filename,
+                "chunk_count": entry["chunk_count"],
+                "uploaded_at": entry["uploaded_at"]
+            }
+            for filename, entry in segment.documents.items()
+        ]
+
+    def search(self, query_embedding, top_k: int = 5,
+               filename_filter: Optional[str] = None,
+               namespace: Optional[str] = None) -> List[FlatHit]:
+        """Single query search, same scoring and re-ranking as the Qdrant path"""
+        return self.search_batch(
+            self._normalize(query_embedding), top_k,
+            filename_filter=filename_filter, namespace=namespace
+        )[0]
+
+    def search_batch(self, query_embeddings, top_k: int = 5,
+                     filename_filter: Optional[str] = None,
+                     namespace: Optional[str] = None) -> List[List[FlatHit]]:
+        """Answer several queries with one matrix product"""
+        queries = self._normalize(query_embeddings)
+
+        with self._lock:
+            segment = self._segment(namespace)
+            if segment is None:
+                return [[] for _ in range(len(queries))]
+
+            # A filename filter narrows scoring to that document's row range
+            if filename_filter:
+                entry = segment.documents.get(filename_filter)
+                if entry is None:
+                    return [[] for _ in range(len(queries))]
+                start, end = entry["start"], entry["end"]
+            else:
+                start, end = 0, segment.count
+
+            if end <= start:
+                return [[] for _ in range(len(queries))]
+
+            # Take a consistent snapshot and score outside the lock. Appends only add rows
+            # past `end` and compaction swaps in new objects, so these stay valid
+            rows = segment.vectors[start:end]
+            alive = segment.alive[start:end].copy()
+            payloads = segment.payloads
+
+        scores = _score_rows(rows, queries)
+        scores[~alive] = -np.inf
+
+        # Get more results for re-ranking, like the Qdrant path
+        limit = min(top_k * 2, end - start)
+        candidates = np.argpartition(-scores, limit - 1, axis=0)[:limit]
+
+        results = []
+        for q in range(len(queries)):
+            rows = candidates[:, q]
+            rows = rows[np.argsort(-scores[rows, q])]
+            hits = [
+                FlatHit(id=int(start + row), score=float(scores[row, q]), payload=dict(payloads[start + row]))
+                for row in rows
+                if scores[row, q] >= self.score_threshold
+            ]
+            results.append(AdvancedVectorStore._rerank_results(hits, top_k))
+        return results
@@ -0,0 +1,232 @@
+# app/ingest.py
+"""Bulk directory ingestion with a resumable manifest.
+
+Usage:
+    python -m app.ingest data/ --workers 4
+
+Documents are indexed into the on-disk Qdrant store (``qdrant/`` by default).
+Start the backend with ``QDRANT_PATH=qdrant`` to serve them.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from app.document_loader import AdvancedDocumentLoader
+from app.profiling import profiler
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+
+def file_sha256(filepath: str) -> str:
+    """Hash file contents without reading the whole file into memory"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def find_documents(directory: str) -> List[str]:
+    """Recursively collect supported documents in a directory"""
+    documents = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                documents.append(os.path.join(root, name))
+    return sorted(documents)
+
+class IngestManifest:
+    """Per-file ingestion status persisted as JSON so interrupted runs can resume.
+
+    Saves are batched (every ``save_every`` records or ``save_interval`` seconds)
+    to avoid rewriting the whole manifest per file; call ``flush`` when done.
+    Files are only recorded after they are indexed, so a lost batch is simply redone.
+    """
+    
+    def __init__(self, path: str, save_every: int = 50, save_interval: float = 5.0):
+        self.path = path
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._unsaved = 0
+        self._last_save = time.time()
+        self.files: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+    
+    def is_done(self, filepath: str, sha256: str) -> bool:
+        entry = self.files.get(filepath)
+        return bool(entry) and entry["status"] == "done" and entry["sha256"] == sha256
+    
+    def record(self, filepath: str, **fields):
+        entry = self.files.setdefault(filepath, {})
+        entry.update(fields, updated_at=time.time())
+        self._unsaved += 1
+        if self._unsaved >= self.save_every or time.time() - self._last_save >= self.save_interval:
+            self.save()
+    
+    def flush(self):
+        """Save pending records, if any"""
+        if self._unsaved:
+            self.save()
+    
+    def save(self):
+        """Write atomically so a crash never leaves a truncated manifest"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        self._last_save = time.time()
+
+def ingest_directory(directory: str, embedder, vector_store, manifest: IngestManifest,
+                     loader: Optional[AdvancedDocumentLoader] = None, workers: int = 4,
+                     namespace: Optional[str] = None) -> Dict:
+    """Ingest every new or changed document of a directory, returns run statistics"""
+    loader = loader or AdvancedDocumentLoader()
+    start_time = time.time()
+    stats = {"files_done": 0, "files_skipped": 0, "files_failed": 0, "chunks": 0, "bytes": 0}
+    
+    # Skip files already ingested with identical contents
+    pending = []
+    for filepath in find_documents(directory):
+        sha256 = file_sha256(filepath)
+        if manifest.is_done(filepath, sha256):
+            stats["files_skipped"] += 1
+        else:
+            pending.append((filepath, sha256))
+    
+    print(f"Found {len(pending)} documents to ingest ({stats['files_skipped']} already done)")
+    
+    # Parsing and chunking run in parallel, embedding and indexing stay in this process.
+    # Only a bounded window of files is in flight so parsed text never piles up in memory
+    max_in_flight = 2 * workers
+    pending_iter = iter(pending)
+    futures = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                for filepath, sha256 in pending_iter:
+                    futures[executor.submit(loader.load_and_chunk_documents, filepath)] = (filepath, sha256)
+                    if len(futures) >= max_in_flight:
+                        break
+                if not futures:
+                    break
+                
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filepath, sha256 = futures.pop(future)
+                    try:
+                        chunks = future.result()
+                        if not chunks:
+                            raise ValueError("No content extracted from document")
+                        
+                        # Key documents by their path under the ingest root so files sharing a
+                        # basename in different sub-directories don't replace each other
+                        document_name = os.path.relpath(filepath, directory).replace(os.sep, "/")
+                        for chunk in chunks:
+                            chunk["metadata"]["filename"] = document_name
+                        
+                        with profiler.session("ingest"):
+                            texts = [chunk["text"] for chunk in chunks]
+                            embeddings = embedder.embed_documents(texts)
+                            with profiler.stage("index"):
+                                vector_store.add_documents(chunks, embeddings, namespace=namespace)
+                        
+                        manifest.record(
+                            filepath,
+                            status="done",
+                            sha256=sha256,
+                            filename=document_name,
+                            chunks_count=len(chunks),
+                            error=None
+                        )
+                        stats["files_done"] += 1
+                        stats["chunks"] += len(chunks)
+                        stats["bytes"] += os.path.getsize(filepath)
+                        print(f"✅ {filepath}: {len(chunks)} chunks")
+                        
+                    except Exception as e:
+                        manifest.record(filepath, status="failed", sha256=sha256, error=str(e))
+                        stats["files_failed"] += 1
+                        print(f"❌ {filepath}: {str(e)}")
+        except KeyboardInterrupt:
+            # Indexed files are in the manifest (flushed below), the next run resumes from there
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            manifest.flush()
+    
+    elapsed = time.time() - start_time
+    stats["elapsed"] = elapsed
+    stats["files_per_sec"] = stats["files_done"] / elapsed if elapsed else 0.0
+    stats["chunks_per_sec"] = stats["chunks"] / elapsed if elapsed else 0.0
+    stats["mb_per_sec"] = stats["bytes"] / 1024**2 / elapsed if elapsed else 0.0
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest PDF/DOCX documents into the vector store")
+    parser.add_argument("directory", nargs="?", default="data", help="Directory to ingest (default: data)")
+    parser.add_argument("--index", choices=["qdrant", "flat"], default="qdrant", help="Vector index backend")
+    parser.add_argument("--qdrant-path", default="qdrant", help="On-disk Qdrant storage (default: qdrant)")
+    parser.add_argument("--flat-path", default="flat_index", help="Flat index directory (default: flat_index)")
+    parser.add_argument("--flat-dtype", choices=["float32", "float16"], default="float32", help="Flat index vector dtype")
+    parser.add_argument("--manifest", default=None, help="Manifest file (default: <index path>/ingest_manifest.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel parsing workers")
+    parser.add_argument("--namespace", default=None, help="Optional tenant namespace")
+    parser.add_argument("--compact", action="store_true",
+                        help="Reclaim rows of deleted/replaced documents in the flat index after ingesting")
+    parser.add_argument("--profile-rate", type=float, default=None,
+                        help="Profile this fraction of files (sessions written to PROFILING_DIR)")
+    args = parser.parse_args()
+    if args.compact and args.index != "flat":
+        parser.error("--compact requires --index flat")
+    
+    if args.profile_rate:
+        profiler.configure(enabled=True, sample_rate=args.profile_rate, torch_trace=True)
+    
+    # Heavy imports only once arguments are valid
+    from app.embedder import AdvancedEmbedder
+    
+    if args.index == "flat":
+        from app.flat_index import FlatVectorStore
+        index_path = args.flat_path
+        vector_store = FlatVectorStore(index_path, dtype=args.flat_dtype)
+    else:
+        from app.vector_store import AdvancedVectorStore
+        index_path = args.qdrant_path
+        vector_store = AdvancedVectorStore(path=index_path)
+    
+    manifest = IngestManifest(args.manifest or os.path.join(index_path, "ingest_manifest.json"))
+    embedder = AdvancedEmbedder()
+    
+    stats = ingest_directory(
+        args.directory, embedder, vector_store, manifest,
+        workers=args.workers, namespace=args.namespace
+    )
+    
+    print(
+        f"\n📊 {stats['files_done']} ingested, {stats['files_skipped']} skipped, "
+        f"{stats['files_failed']} failed in {stats['elapsed']:.1f}s"
+    )
+    print(
+        f"⚡ {stats['files_per_sec']:.2f} files/s, {stats['chunks_per_sec']:.1f} chunks/s, "
+        f"{stats['mb_per_sec']:.2f} MB/s"
+    )
+    
+    if args.compact:
+        print(f"🧹 Compacted flat index, reclaimed {vector_store.compact(args.namespace)} rows")
+    
+    if profiler.recent:
+        print(f"\n🔬 Profiled {len(profiler.recent)} files, top functions per stage:")
+        for stage, entry in profiler.summary()["stages"].items():
+            hot = ", ".join(row["function"] for row in entry["hot_functions"][:3])
+            print(f"  {stage}: {entry['mean_time'] * 1000:.1f} ms avg | {hot}")
+
+if __name__ == "__main__":
+    main()
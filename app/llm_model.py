@@ -1,14 +1,30 @@
 # app/llm_model.py
-from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+from threading import Event, Thread
+from typing import Iterator
+import contextvars
+import queue
 import torch
 import re
 
+from app.profiling import profiler
+
+STREAM_TOKEN_TIMEOUT = 60.0  # seconds to wait for the next streamed token before giving up
+
 class StopOnINST(StoppingCriteria):
     def __call__(self, input_ids, scores, **kwargs):
         # Stop when the token corresponding to ' [/INST]' is generated
         decoded = self.tokenizer.decode(input_ids[0], skip_special_tokens=True)
         return decoded.strip().endswith("[/INST]")
 
+class StopOnEvent(StoppingCriteria):
+    """Stop generation once the stream consumer has gone away"""
+    def __init__(self, event: Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
 class LLM:
     def __init__(self):
         model_id = "models/stablelm-zephyr-3b"
@@ -19,16 +35,13 @@ class LLM:
         # For stopping criterion we need tokenizer scope
         StopOnINST.tokenizer = self.tokenizer
 
-    def generate_answer(self, query: str, contexts: list) -> str:
-        """
-        contexts: list of dicts with keys: 'text' and optionally 'source_id'
-        """
-        # Format context chunks with numbered sources
+    def _build_prompt(self, query: str, contexts: list) -> str:
+        """Format context chunks with numbered sources into the answer prompt"""
         formatted_context = ""
         for i, ctx in enumerate(contexts, 1):
             formatted_context += f"[Source {i}]\n{ctx['text'].strip()}\n\n"
 
-        prompt = (
+        return (
             "You are a helpful assistant that answers questions based solely on the provided context.\n\n"
             "INSTRUCTIONS:\n"
             "1. Use only the information contained in the context below to answer the question.\n"
@@ -40,13 +53,13 @@ class LLM:
             "ANSWER:"
         )
 
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True).to(self.model.device)
-        stopping = StoppingCriteriaList([StopOnINST()])
-
-        outputs = self.model.generate(
+    def _generation_kwargs(self, prompt: str) -> dict:
+        with profiler.stage("tokenize"):
+            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True).to(self.model.device)
+        return dict(
             **inputs,
             max_new_tokens=256,
-            stopping_criteria=stopping,
+            stopping_criteria=StoppingCriteriaList([StopOnINST()]),
             pad_token_id=self.tokenizer.eos_token_id,
             temperature=0.2,  # Lower temperature for factual answers
             top_p=0.9,
@@ -54,13 +67,72 @@ class LLM:
             repetition_penalty=1.1
         )
 
-        full = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        # Extract only the answer part
-        if "ANSWER:" in full:
-            answer = full.split("ANSWER:")[-1].strip()
-        else:
-            answer = full.strip()
-        # Remove any [Source X] references from the answer
+    @staticmethod
+    def clean_answer(answer: str) -> str:
+        """Remove any [Source X] references and normalize whitespace"""
         answer = re.sub(r'\[Source \d+\]', '', answer)
-        answer = re.sub(r'\s+', ' ', answer).strip()
-        return answer
+        return re.sub(r'\s+', ' ', answer).strip()
+
+    def generate_answer(self, query: str, contexts: list) -> str:
+        """
+        contexts: list of dicts with keys: 'text' and optionally 'source_id'
+        """
+        prompt = self._build_prompt(query, contexts)
+        generation_kwargs = self._generation_kwargs(prompt)
+        with profiler.stage("generate", torch_trace=True):
+            outputs = self.model.generate(**generation_kwargs)
+
+        with profiler.stage("postprocess"):
+            full = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Extract only the answer part
+            if "ANSWER:" in full:
+                answer = full.split("ANSWER:")[-1].strip()
+            else:
+                answer = full.strip()
+            return self.clean_answer(answer)
+
+    def _generate(self, streamer: TextIteratorStreamer, errors: list, **generation_kwargs):
+        try:
+            with profiler.stage("generate", torch_trace=True):
+                self.model.generate(streamer=streamer, **generation_kwargs)
+        except Exception as e:
+            # Hand the error to the consumer and unblock it, generate() only ends the stream on success
+            errors.append(e)
+            streamer.end()
+
+    def generate_answer_stream(self, query: str, contexts: list) -> Iterator[str]:
+        """
+        Yield answer text incrementally as tokens are generated.
+        Pieces are raw model output; use clean_answer on the joined text for the final answer.
+        """
+        prompt = self._build_prompt(query, contexts)
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_TOKEN_TIMEOUT
+        )
+        generation_kwargs = self._generation_kwargs(prompt)
+        stop = Event()
+        generation_kwargs["stopping_criteria"].append(StopOnEvent(stop))
+        errors = []
+
+        # generate() blocks, so run it in a background thread and consume the streamer here;
+        # the copied context keeps an active profiling session visible in that thread
+        thread = Thread(
+            target=contextvars.copy_context().run,
+            args=(self._generate, streamer, errors),
+            kwargs=generation_kwargs,
+            daemon=True
+        )
+        thread.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        except queue.Empty:
+            raise TimeoutError(f"No tokens generated within {STREAM_TOKEN_TIMEOUT:g}s")
+        finally:
+            # Stops generation early on timeout or when the client disconnects mid-stream
+            stop.set()
+            thread.join(timeout=STREAM_TOKEN_TIMEOUT)
+
+        if errors:
+            raise errors[0]
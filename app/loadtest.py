@@ -0,0 +1,279 @@
+# app/loadtest.py
+"""Replay recorded query traffic against the backend and report latency statistics.
+
+Usage:
+    python -m app.loadtest queries.jsonl --rate 5 --duration 60
+    python -m app.loadtest queries.jsonl --ramp 1,4,16 --stage-duration 30
+    python -m app.loadtest queries.jsonl --offline --seed "data/Policy and FAQ Document.pdf"
+
+Each JSONL record is either a question (``{"query": ..., "filename_filter": ..., "namespace": ...}``)
+replayed against ``/ask/``, or an upload (``{"file": "path/to/doc.pdf", "namespace": ...}``)
+replayed against ``/upload/``. Records without a ``query`` fall back to their ``body``/``text``/``title``.
+
+``--offline`` starts a local backend with stub models and an in-memory vector store.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+QUERY_FIELDS = ("query", "body", "text", "title")
+
+def load_records(path: str) -> List[Dict]:
+    """Load replayable records from a JSONL log"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("file"):
+                records.append({"endpoint": "/upload/", "file": entry["file"], "namespace": entry.get("namespace")})
+                continue
+            query = next((entry[field] for field in QUERY_FIELDS if entry.get(field)), None)
+            if query:
+                records.append({
+                    "endpoint": "/ask/",
+                    "query": query,
+                    "filename_filter": entry.get("filename_filter"),
+                    "namespace": entry.get("namespace")
+                })
+    if not records:
+        raise ValueError(f"No replayable records in {path}")
+    return records
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+class LoadGenerator:
+    """Sends replayed records to the backend and collects per-request timings"""
+    
+    def __init__(self, base_url: str, records: List[Dict], timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.records = records
+        self.timeout = timeout
+        self.results: List[Dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_record = 0
+    
+    def _session(self) -> requests.Session:
+        # One keep-alive session per worker thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+    
+    def next_record(self) -> Dict:
+        """Cycle through the log in order"""
+        with self._lock:
+            record = self.records[self._next_record % len(self.records)]
+            self._next_record += 1
+        return record
+    
+    def send(self, record: Dict, scheduled_at: float, stage: Optional[str] = None):
+        """Send one request; queueing delay is the time between its scheduled and actual start"""
+        started_at = time.perf_counter()
+        url = f"{self.base_url}{record['endpoint']}"
+        error = None
+        status = None
+        try:
+            if record["endpoint"] == "/upload/":
+                params = {"namespace": record["namespace"]} if record.get("namespace") else None
+                with open(record["file"], "rb") as f:
+                    response = self._session().post(
+                        url, files={"file": (os.path.basename(record["file"]), f)},
+                        params=params, timeout=self.timeout
+                    )
+            else:
+                payload = {key: record.get(key) for key in ("query", "filename_filter", "namespace")}
+                response = self._session().post(url, json=payload, timeout=self.timeout)
+            status = response.status_code
+            if status != 200:
+                error = f"HTTP {status}"
+        except Exception as e:
+            error = type(e).__name__
+        finished_at = time.perf_counter()
+        
+        with self._lock:
+            self.results.append({
+                "endpoint": record["endpoint"],
+                "stage": stage,
+                "scheduled_at": scheduled_at,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "latency": finished_at - started_at,
+                "queue_delay": started_at - scheduled_at,
+                "status": status,
+                "error": error
+            })
+    
+    def run_open_loop(self, rate: float, duration: float, max_concurrency: int,
+                      poisson: bool = True) -> List[Dict]:
+        """Issue requests at a fixed arrival rate regardless of how fast the backend answers"""
+        start = time.perf_counter()
+        next_arrival = start
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            while next_arrival - start < duration:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, self.next_record(), next_arrival, f"{rate:g} req/s")
+                next_arrival += random.expovariate(rate) if poisson else 1.0 / rate
+        return self.results
+    
+    def run_ramp(self, concurrency_levels: List[int], stage_duration: float) -> List[Dict]:
+        """Closed-loop stages: each of N workers sends its next request as soon as the previous one returns"""
+        for concurrency in concurrency_levels:
+            stage = f"{concurrency} concurrent"
+            stage_end = time.perf_counter() + stage_duration
+            
+            def worker():
+                while time.perf_counter() < stage_end:
+                    self.send(self.next_record(), time.perf_counter(), stage)
+            
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return self.results
+
+def summarize(results: List[Dict]) -> List[Dict]:
+    """Throughput, latency percentiles, error rate and queueing delay per stage and endpoint"""
+    groups: Dict[tuple, List[Dict]] = {}
+    for result in results:
+        groups.setdefault((result["stage"], result["endpoint"]), []).append(result)
+    
+    summary = []
+    for (stage, endpoint), group in groups.items():
+        latencies = [r["latency"] for r in group]
+        queue_delays = [r["queue_delay"] for r in group]
+        window = max(r["finished_at"] for r in group) - min(r["scheduled_at"] for r in group)
+        errors = sum(1 for r in group if r["error"])
+        summary.append({
+            "stage": stage,
+            "endpoint": endpoint,
+            "requests": len(group),
+            "throughput": (len(group) - errors) / window if window > 0 else 0.0,
+            "error_rate": errors / len(group),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p90": percentile(latencies, 90),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "latency_max": max(latencies),
+            "queue_delay_mean": sum(queue_delays) / len(queue_delays),
+            "queue_delay_p95": percentile(queue_delays, 95)
+        })
+    return summary
+
+def print_summary(summary: List[Dict]):
+    header = (
+        f"{'stage':<16} {'endpoint':<10} {'reqs':>6} {'ok/s':>7} {'err%':>6} "
+        f"{'p50':>7} {'p90':>7} {'p95':>7} {'p99':>7} {'queue':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in summary:
+        print(
+            f"{str(row['stage']):<16} {row['endpoint']:<10} {row['requests']:>6} "
+            f"{row['throughput']:>7.2f} {row['error_rate'] * 100:>5.1f}% "
+            f"{row['latency_p50']:>6.3f}s {row['latency_p90']:>6.3f}s "
+            f"{row['latency_p95']:>6.3f}s {row['latency_p99']:>6.3f}s "
+            f"{row['queue_delay_mean']:>6.3f}s"
+        )
+
+def start_offline_backend(port: int, llm_latency: float) -> subprocess.Popen:
+    """Start the backend with stub models and an in-memory vector store"""
+    env = dict(os.environ, RAG_STUB_MODELS="1", RAG_STUB_LLM_LATENCY=str(llm_latency))
+    env.pop("QDRANT_PATH", None)
+    env.pop("VECTOR_INDEX", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.backend:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env
+    )
+    
+    # Wait until the health endpoint answers
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Offline backend exited during startup")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health/", timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Offline backend did not become healthy in time")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay JSONL query logs against the RAG backend")
+    parser.add_argument("log", help="JSONL file with recorded queries/uploads")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--rate", type=float, default=2.0, help="Open-loop arrival rate (requests/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Open-loop duration in seconds")
+    parser.add_argument("--constant", action="store_true", help="Constant inter-arrival times instead of Poisson")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Max in-flight open-loop requests")
+    parser.add_argument("--ramp", default=None, help="Closed-loop concurrency stages, e.g. 1,4,16")
+    parser.add_argument("--stage-duration", type=float, default=30.0, help="Seconds per ramp stage")
+    parser.add_argument("--offline", action="store_true", help="Start a local backend with stub models")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the offline backend")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--seed", nargs="*", default=[], help="Documents uploaded before the run (not measured)")
+    parser.add_argument("--output", default=None, help="Write summary and raw results as JSON")
+    args = parser.parse_args()
+    
+    records = load_records(args.log)
+    backend = None
+    base_url = args.url
+    if args.offline:
+        backend = start_offline_backend(args.port, args.stub_latency)
+        base_url = f"http://127.0.0.1:{args.port}"
+    
+    try:
+        generator = LoadGenerator(base_url, records)
+        for filepath in args.seed:
+            generator.send({"endpoint": "/upload/", "file": filepath}, time.perf_counter(), "seed")
+        for result in generator.results:
+            if result["error"]:
+                print(f"⚠️ Seeding failed: {result['error']}")
+        generator.results.clear()
+        
+        print(f"Replaying {len(records)} records against {base_url}")
+        if args.ramp:
+            levels = [int(level) for level in args.ramp.split(",")]
+            results = generator.run_ramp(levels, args.stage_duration)
+        else:
+            results = generator.run_open_loop(
+                args.rate, args.duration, args.max_concurrency, poisson=not args.constant
+            )
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait()
+    
+    summary = summarize(results)
+    print_summary(summary)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# app/profiling.py
+"""Opt-in profiling of the request and ingestion hot paths.
+
+Code marks its stages with ``profiler.stage("name")``. Outside a sampled
+session this returns a shared no-op context manager, so the hooks stay cheap
+when profiling is off. Inside a session each stage is timed, profiled with
+cProfile and, for model stages, optionally traced with the torch profiler.
+Results go to a rotating directory (one sub-directory per session).
+"""
+import contextvars
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+_NULL_STAGE = nullcontext()
+_current_session: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+MAX_SESSIONS_LIMIT = 500
+# Only directories named like sessions are ever rotated out of the output directory.
+# The timestamp (down to microseconds) comes first so names sort in start order
+SESSION_DIR_PATTERN = re.compile(r'^\d{8}_\d{6}_\d{6}_[A-Za-z0-9_]+_[0-9a-f]{8}$')
+
+# Only one cProfile / torch profiler can be active at a time in a process
+_cprofile_lock = threading.Lock()
+_torch_lock = threading.Lock()
+
+class ProfileSession:
+    """Stage timings and profiles collected for one request or ingestion job"""
+
+    def __init__(self, name: str, output_dir: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.started_at = time.time()
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started_at))
+        timestamp += f"_{int(self.started_at * 1_000_000) % 1_000_000:06d}"
+        self.directory = os.path.join(output_dir, f"{timestamp}_{name}_{self.id}")
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.stats: Dict[str, pstats.Stats] = {}
+        self.traces: List[str] = []
+
+    def record(self, stage: str, wall_time: float, profile: Optional[cProfile.Profile]):
+        entry = self.stages.setdefault(stage, {"wall_time": 0.0, "calls": 0})
+        entry["wall_time"] += wall_time
+        entry["calls"] += 1
+        if profile is not None:
+            if stage in self.stats:
+                self.stats[stage].add(profile)
+            else:
+                self.stats[stage] = pstats.Stats(profile)
+
+def _hot_functions(stats: pstats.Stats, top_n: int) -> List[Dict[str, Any]]:
+    """Top functions of a profile by own (exclusive) time"""
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({function})",
+            "calls": calls,
+            "tottime": tottime,
+            "cumtime": cumtime
+        })
+    rows.sort(key=lambda row: row["tottime"], reverse=True)
+    return rows[:top_n]
+
+class Profiler:
+    """Samples requests/jobs into profile sessions, configurable at runtime"""
+
+    def __init__(self, output_dir: str = "profiles", enabled: bool = False, sample_rate: float = 1.0,
+                 torch_trace: bool = False, max_sessions: int = 50, top_n: int = 10):
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.torch_trace = torch_trace
+        self.max_sessions = max_sessions
+        self.top_n = top_n
+        self.recent: deque = deque(maxlen=max_sessions)
+        self._lock = threading.Lock()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "torch_trace": self.torch_trace,
+            "max_sessions": self.max_sessions,
+            "output_dir": self.output_dir
+        }
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  torch_trace: Optional[bool] = None, max_sessions: Optional[int] = None):
+        """Update settings; None leaves a setting unchanged"""
+        if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if max_sessions is not None and not 1 <= max_sessions <= MAX_SESSIONS_LIMIT:
+            raise ValueError(f"max_sessions must be between 1 and {MAX_SESSIONS_LIMIT}")
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if torch_trace is not None:
+                self.torch_trace = torch_trace
+            if max_sessions is not None:
+                self.max_sessions = max_sessions
+                self.recent = deque(self.recent, maxlen=max_sessions)
+        return self.settings()
+
+    def start(self, name: str, force: bool = False) -> Optional[ProfileSession]:
+        """Start a session if this request/job is sampled (or forced), else return None"""
+        if not (force or (self.enabled and random.random() < self.sample_rate)):
+            return None
+        session = ProfileSession(name, self.output_dir)
+        os.makedirs(session.directory, exist_ok=True)
+        return session
+
+    @contextmanager
+    def activate(self, session: Optional[ProfileSession]):
+        """Make a session current for the enclosed block (must not span a yield)"""
+        if session is None:
+            yield
+            return
+        token = _current_session.set(session)
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+
+    @contextmanager
+    def session(self, name: str, force: bool = False):
+        """Profile the enclosed block if it is sampled (or forced), yields the session or None"""
+        session = self.start(name, force)
+        try:
+            with self.activate(session):
+                yield session
+        finally:
+            self.finish(session)
+
+    def stage(self, name: str, torch_trace: bool = False):
+        """Context manager marking a hot-path stage; a no-op outside a profiled session"""
+        session = _current_session.get()
+        if session is None:
+            return _NULL_STAGE
+        return self._profile_stage(session, name, torch_trace and self.torch_trace)
+
+    @contextmanager
+    def _profile_stage(self, session: ProfileSession, name: str, torch_trace: bool):
+        profile = None
+        if _cprofile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiling tool is active, fall back to timing only
+                profile = None
+                _cprofile_lock.release()
+
+        torch_profile = None
+        if torch_trace and _torch_lock.acquire(blocking=False):
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            torch_profile = torch.profiler.profile(activities=activities)
+            torch_profile.__enter__()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                _cprofile_lock.release()
+            if torch_profile is not None:
+                torch_profile.__exit__(None, None, None)
+                trace_path = os.path.join(session.directory, f"{name}_{len(session.traces)}.trace.json")
+                torch_profile.export_chrome_trace(trace_path)
+                session.traces.append(trace_path)
+                _torch_lock.release()
+            session.record(name, wall_time, profile)
+
+    def finish(self, session: Optional[ProfileSession]):
+        """Write profiles and a summary, then rotate old sessions out"""
+        if session is None:
+            return
+        summary = {
+            "id": session.id,
+            "name": session.name,
+            "started_at": session.started_at,
+            "total_time": time.time() - session.started_at,
+            "directory": session.directory,
+            "traces": session.traces,
+            "stages": {}
+        }
+        for stage, entry in session.stages.items():
+            stage_summary = dict(entry)
+            if stage in session.stats:
+                session.stats[stage].dump_stats(os.path.join(session.directory, f"{stage}.prof"))
+                stage_summary["hot_functions"] = _hot_functions(session.stats[stage], self.top_n)
+            summary["stages"][stage] = stage_summary
+
+        with open(os.path.join(session.directory, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        with self._lock:
+            self.recent.append(summary)
+            self._rotate()
+
+    def _rotate(self):
+        """Keep only the newest max_sessions session directories, never touching anything else"""
+        sessions = sorted(
+            entry.path for entry in os.scandir(self.output_dir)
+            if entry.is_dir() and SESSION_DIR_PATTERN.match(entry.name)
+        )
+        for path in sessions[:-self.max_sessions]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage wall time and top hot functions aggregated over recent sessions"""
+        stages: Dict[str, Dict[str, Any]] = {}
+        for session in list(self.recent):
+            for stage, entry in session["stages"].items():
+                aggregate = stages.setdefault(stage, {"calls": 0, "wall_time": 0.0, "functions": {}})
+                aggregate["calls"] += entry["calls"]
+                aggregate["wall_time"] += entry["wall_time"]
+                for row in entry.get("hot_functions", []):
+                    function = aggregate["functions"].setdefault(row["function"], {"calls": 0, "tottime": 0.0})
+                    function["calls"] += row["calls"]
+                    function["tottime"] += row["tottime"]
+
+        result = {}
+        for stage, aggregate in stages.items():
+            hot = sorted(aggregate["functions"].items(), key=lambda item: item[1]["tottime"], reverse=True)
+            result[stage] = {
+                "calls": aggregate["calls"],
+                "mean_time": aggregate["wall_time"] / aggregate["calls"],
+                "hot_functions": [{"function": name, **values} for name, values in hot[:self.top_n]]
+            }
+        return {"sessions": len(self.recent), "stages": result}
+
+# Shared profiler, configured from the environment and at runtime via /admin/profiling
+profiler = Profiler(
+    output_dir=os.environ.get("PROFILING_DIR", "profiles"),
+    enabled=os.environ.get("PROFILING_ENABLED", "") == "1",
+    sample_rate=float(os.environ.get("PROFILING_SAMPLE_RATE", "0.01"))
+)
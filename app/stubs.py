@@ -0,0 +1,68 @@
+# app/stubs.py
+"""Lightweight stand-ins for the embedding model and LLM.
+
+Used when the backend runs with ``RAG_STUB_MODELS=1`` (e.g. offline load tests
+from ``app/loadtest.py``) so no model weights or GPU are needed.
+"""
+import hashlib
+import os
+import time
+from typing import Iterator, List
+
+import numpy as np
+
+from app.llm_model import LLM
+
+EMBEDDING_DIM = 384
+
+class StubEmbedder:
+    """Deterministic hash-based embeddings with the same shape as MiniLM-L6-v2"""
+    
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        # Shared component keeps stub vectors similar enough to pass the search score threshold
+        self._common = self._unit(np.random.default_rng(0).standard_normal(dim))
+    
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+    
+    def _embed(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        noise = self._unit(np.random.default_rng(seed).standard_normal(self.dim))
+        return self._unit(0.8 * self._common + 0.6 * noise)
+    
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self._embed(text) for text in texts])
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        return self._embed(query.lower().strip())
+
+class StubLLM:
+    """Echoes the start of the retrieved context after a configurable delay"""
+    
+    def __init__(self, latency: float = None, token_latency: float = None, max_words: int = 40):
+        # Delays default to RAG_STUB_LLM_LATENCY / RAG_STUB_TOKEN_LATENCY (seconds)
+        self.latency = latency if latency is not None else float(os.environ.get("RAG_STUB_LLM_LATENCY", 0.05))
+        self.token_latency = (
+            token_latency if token_latency is not None else float(os.environ.get("RAG_STUB_TOKEN_LATENCY", 0.0))
+        )
+        self.max_words = max_words
+    
+    # Same post-processing as the real model
+    clean_answer = staticmethod(LLM.clean_answer)
+    
+    def _words(self, contexts: list) -> List[str]:
+        text = " ".join(ctx["text"] for ctx in contexts)
+        return text.split()[:self.max_words] or ["Answer", "not", "found", "in", "the", "document."]
+    
+    def generate_answer(self, query: str, contexts: list) -> str:
+        words = self._words(contexts)
+        time.sleep(self.latency + self.token_latency * len(words))
+        return self.clean_answer(" ".join(words))
+    
+    def generate_answer_stream(self, query: str, contexts: list) -> Iterator[str]:
+        time.sleep(self.latency)
+        for word in self._words(contexts):
+            time.sleep(self.token_latency)
+            yield word + " "
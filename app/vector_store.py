@@ -1,30 +1,105 @@
 # app/vector_store.py
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, PointIdsList
+)
+import re
+import time
 import uuid
 import numpy as np
 from typing import List, Dict, Optional
 
+NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+RESERVED_NAMESPACES = {"_default"}
+
+def validate_namespace(namespace: Optional[str]) -> Optional[str]:
+    """Reject namespaces that could escape the storage directory or alias the default tenant"""
+    if namespace is None or namespace == "":
+        return None
+    if namespace in RESERVED_NAMESPACES:
+        raise ValueError(f"Namespace {namespace!r} is reserved")
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(f"Invalid namespace: {namespace!r}. Use letters, digits, '_' or '-'")
+    return namespace
+
 class AdvancedVectorStore:
-    def __init__(self, collection_name="advanced_rag_docs"):
-        self.client = QdrantClient(":memory:")
+    def __init__(self, collection_name="advanced_rag_docs", path: Optional[str] = None):
+        # In-memory by default, on-disk local storage when a path is given
+        self.client = QdrantClient(path=path) if path else QdrantClient(":memory:")
         self.collection_name = collection_name
-        self._create_collection()
+        # Document registry per collection: filename -> point ids, chunk count, upload time
+        self.registry: Dict[str, Dict[str, Dict]] = {}
+        
+        # Reuse collections persisted by a previous run instead of wiping them
+        existing = [c.name for c in self.client.get_collections().collections]
+        for name in existing:
+            if name == collection_name or name.startswith(f"{collection_name}__"):
+                self._load_registry(name)
+        if collection_name not in self.registry:
+            self._create_collection(self.collection_name)
     
-    def _create_collection(self):
+    def _create_collection(self, collection_name: str):
         """Create collection with optimized settings"""
         self.client.recreate_collection(
-            collection_name=self.collection_name,
+            collection_name=collection_name,
             vectors_config=VectorParams(size=384, distance=Distance.COSINE),
             # Optimize for memory usage
             optimizers_config={
                 "default_segment_number": 2
             }
         )
+        self.registry[collection_name] = {}
+    
+    def _load_registry(self, collection_name: str):
+        """Rebuild the document registry of an existing collection from its payloads"""
+        documents = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=["filename", "uploaded_at"],
+                with_vectors=False
+            )
+            for point in points:
+                entry = documents.setdefault(point.payload["filename"], {
+                    "point_ids": [],
+                    "chunk_count": 0,
+                    "uploaded_at": point.payload.get("uploaded_at", 0.0)
+                })
+                entry["point_ids"].append(point.id)
+                entry["chunk_count"] += 1
+            if offset is None:
+                break
+        self.registry[collection_name] = documents
+    
+    def _collection_for(self, namespace: Optional[str] = None, create: bool = False) -> Optional[str]:
+        """Resolve the collection backing a namespace (one collection per tenant)"""
+        namespace = validate_namespace(namespace)
+        if namespace is None:
+            return self.collection_name
+        
+        collection_name = f"{self.collection_name}__{namespace}"
+        if collection_name not in self.registry:
+            if not create:
+                return None
+            self._create_collection(collection_name)
+        return collection_name
     
-    def add_documents(self, chunks: List[Dict], embeddings: np.ndarray):
-        """Add documents with enhanced metadata"""
+    def add_documents(self, chunks: List[Dict], embeddings: np.ndarray,
+                      namespace: Optional[str] = None):
+        """Add documents with enhanced metadata, replacing any previous version of the same file"""
+        collection_name = self._collection_for(namespace, create=True)
+        documents = self.registry[collection_name]
+        
+        # Drop stale points of files being re-indexed
+        for filename in {chunk["metadata"]["filename"] for chunk in chunks}:
+            if filename in documents:
+                self.delete_document(filename, namespace=namespace)
+        
         points = []
+        uploaded_at = time.time()
         
         for chunk, embedding in zip(chunks, embeddings):
             # Enhanced payload with more metadata for filtering
@@ -32,7 +107,8 @@ class AdvancedVectorStore:
                 **chunk["metadata"],
                 "text": chunk["text"],
                 "text_length": len(chunk["text"]),
-                "word_count": len(chunk["text"].split())
+                "word_count": len(chunk["text"].split()),
+                "uploaded_at": uploaded_at
             }
             
             point = PointStruct(
@@ -47,13 +123,55 @@ class AdvancedVectorStore:
         for i in range(0, len(points), batch_size):
             batch = points[i:i + batch_size]
             self.client.upsert(
-                collection_name=self.collection_name,
+                collection_name=collection_name,
                 points=batch
             )
+        
+        # Record the new points in the document registry
+        for point in points:
+            entry = documents.setdefault(point.payload["filename"], {
+                "point_ids": [],
+                "chunk_count": 0,
+                "uploaded_at": uploaded_at
+            })
+            entry["point_ids"].append(point.id)
+            entry["chunk_count"] += 1
+    
+    def delete_document(self, filename: str, namespace: Optional[str] = None) -> int:
+        """Delete all points of a document, returns the number of removed chunks"""
+        collection_name = self._collection_for(namespace)
+        if collection_name is None or filename not in self.registry[collection_name]:
+            raise KeyError(filename)
+        
+        entry = self.registry[collection_name].pop(filename)
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=entry["point_ids"])
+        )
+        return entry["chunk_count"]
+    
+    def list_documents(self, namespace: Optional[str] = None) -> List[Dict]:
+        """List indexed documents with chunk count and upload time"""
+        collection_name = self._collection_for(namespace)
+        if collection_name is None:
+            return []
+        
+        return [
+            {
+                "filename": filename,
+                "chunk_count": entry["chunk_count"],
+                "uploaded_at": entry["uploaded_at"]
+            }
+            for filename, entry in self.registry[collection_name].items()
+        ]
     
     def search(self, query_embedding: np.ndarray, top_k: int = 5, 
-               filename_filter: Optional[str] = None) -> List:
+               filename_filter: Optional[str] = None,
+               namespace: Optional[str] = None) -> List:
         """Enhanced search with filtering and scoring"""
+        collection_name = self._collection_for(namespace)
+        if collection_name is None:
+            return []
         
         # Prepare filter if filename is specified
         search_filter = None
@@ -69,7 +187,7 @@ class AdvancedVectorStore:
         
         # Perform search with increased top_k for better coverage
         hits = self.client.search(
-            collection_name=self.collection_name,
+            collection_name=collection_name,
             query_vector=query_embedding.tolist(),
             query_filter=search_filter,
             limit=top_k * 2,  # Get more results for re-ranking
@@ -81,7 +199,8 @@ class AdvancedVectorStore:
         
         return ranked_hits
     
-    def _rerank_results(self, hits: List, top_k: int) -> List:
+    @staticmethod
+    def _rerank_results(hits: List, top_k: int) -> List:
         """Re-rank results based on multiple factors"""
         if not hits:
             return hits
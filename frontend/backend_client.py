@@ -0,0 +1,67 @@
+# frontend/backend_client.py
+import json
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+BACKEND_URL = "http://127.0.0.1:8000"
+UPLOAD_CHUNK_SIZE = 256 * 1024  # 256 KB
+
+class BackendClient:
+    """Reusable client for the FastAPI backend with a pooled keep-alive session"""
+    
+    def __init__(self, base_url: str = BACKEND_URL, pool_size: int = 4, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+    
+    @staticmethod
+    def _iter_chunks(file: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        """Read a file-like object in fixed-size chunks"""
+        file.seek(0)
+        for block in iter(lambda: file.read(chunk_size), b""):
+            yield block
+    
+    def upload(self, file: BinaryIO, filename: str, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """Upload a document as a chunked request body"""
+        params = {"filename": filename}
+        if namespace:
+            params["namespace"] = namespace
+        
+        # A generator body makes requests use chunked transfer encoding
+        response = self.session.post(
+            self._url("/upload/stream/"),
+            params=params,
+            data=self._iter_chunks(file),
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def ask_stream(self, query: str, filename_filter: Optional[str] = None,
+                   namespace: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Ask a question and yield backend events (sources, token, done, error) as they arrive"""
+        payload = {"query": query, "filename_filter": filename_filter, "namespace": namespace}
+        with self.session.post(
+            self._url("/ask/stream/"),
+            json=payload,
+            stream=True,
+            timeout=self.timeout
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+    
+    def health(self) -> Dict[str, Any]:
+        """Fetch backend health information"""
+        response = self.session.get(self._url("/health/"), timeout=5)
+        response.raise_for_status()
+        return response.json()
@@ -5,6 +5,10 @@ import time
 import json
 from typing import Dict, Any
 
+from backend_client import BackendClient
+
+HEALTH_CACHE_TTL = 15  # seconds between backend health polls
+
 # Page configuration
 st.set_page_config(
     page_title="🧠 Advanced RAG Chatbot",
@@ -39,6 +43,28 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def get_backend_client() -> BackendClient:
+    """Pooled client kept across reruns; one per browser session since requests.Session isn't thread-safe"""
+    if "backend_client" not in st.session_state:
+        st.session_state.backend_client = BackendClient()
+    return st.session_state.backend_client
+
+@st.cache_data(ttl=HEALTH_CACHE_TTL, show_spinner=False)
+def fetch_health(_client: BackendClient) -> Dict[str, Any]:
+    """Health info, polled at most once per TTL instead of on every rerun.
+
+    Failures are returned rather than raised so they are cached too and a
+    down backend isn't polled (and waited on) on every rerun.
+    """
+    try:
+        return {"ok": True, "data": _client.health()}
+    except requests.exceptions.HTTPError:
+        return {"ok": False, "reachable": True}
+    except requests.exceptions.RequestException:
+        return {"ok": False, "reachable": False}
+
+client = get_backend_client()
+
 # Main header
 st.markdown('<h1 class="main-header">🧠 Advanced RAG Chatbot</h1>', unsafe_allow_html=True)
 
@@ -53,24 +79,38 @@ with st.sidebar:
         help="Upload PDF or Word documents for the chatbot to use as knowledge base"
     )
     
+    if "uploaded_files" not in st.session_state:
+        st.session_state.uploaded_files = {}
+    
     if uploaded_file:
-        with st.spinner("🔄 Processing document..."):
-            files = {"file": uploaded_file.getvalue()}
-            response = requests.post("http://127.0.0.1:8000/upload/", files=files)
+        # The uploader keeps its file across reruns; only send each file once,
+        # remembering failures too so they aren't re-sent with every chat message
+        upload_key = (uploaded_file.name, uploaded_file.size)
+        data = st.session_state.uploaded_files.get(upload_key)
+        
+        if data is None:
+            with st.spinner("🔄 Processing document..."):
+                try:
+                    data = client.upload(uploaded_file, uploaded_file.name)
+                except requests.exceptions.RequestException as e:
+                    data = {"error": str(e)}
+                st.session_state.uploaded_files[upload_key] = data
+        
+        if "error" in data:
+            st.error("❌ Failed to process document")
+            if st.button("🔁 Retry upload"):
+                del st.session_state.uploaded_files[upload_key]
+                st.rerun()
+        else:
+            st.success("✅ Document processed successfully!")
+            st.info(f"📊 {data['chunks_count']} chunks indexed")
             
-            if response.status_code == 200:
-                data = response.json()
-                st.success("✅ Document processed successfully!")
-                st.info(f"📊 {data['chunks_count']} chunks indexed")
-                
-                # Show GPU usage if available
-                if "gpu_usage" in data and data["gpu_usage"]["gpu_available"]:
-                    with st.expander("🖥️ GPU Usage"):
-                        gpu_data = data["gpu_usage"]
-                        st.metric("Memory Allocated", f"{gpu_data['memory_allocated']:.1f} MB")
-                        st.metric("Memory Cached", f"{gpu_data['memory_cached']:.1f} MB")
-            else:
-                st.error("❌ Failed to process document")
+            # Show GPU usage if available
+            if "gpu_usage" in data and data["gpu_usage"]["gpu_available"]:
+                with st.expander("🖥️ GPU Usage"):
+                    gpu_data = data["gpu_usage"]
+                    st.metric("Memory Allocated", f"{gpu_data['memory_allocated']:.1f} MB")
+                    st.metric("Memory Cached", f"{gpu_data['memory_cached']:.1f} MB")
     
     st.divider()
     
@@ -92,14 +132,39 @@ if "messages" not in st.session_state:
 # Main chat interface
 st.header("💬 Chat Interface")
 
-# Display conversation statistics
+# Conversation statistics are filled in at the end of the run so they include the latest answer
 col1, col2, col3 = st.columns(3)
-with col1:
-    st.metric("Total Queries", st.session_state.conversation_stats["total_queries"])
-with col2:
-    st.metric("Avg Response Time", f"{st.session_state.conversation_stats['avg_response_time']:.2f}s")
-with col3:
-    st.metric("Avg Confidence", f"{st.session_state.conversation_stats['avg_confidence']:.2f}")
+
+def render_assistant_details(message: Dict[str, Any]):
+    """Render sources, confidence and timing below an answer"""
+    # Show sources if enabled
+    if show_sources and message.get("sources"):
+        st.caption("📄 **Sources:**")
+        # Display sources as they come from backend (already deduplicated and formatted)
+        st.caption(message["sources"])
+    # Show confidence and timing if enabled
+    if show_confidence:
+        conf = message.get("confidence", 0)
+        if conf >= 0.8:
+            conf_class = "confidence-high"
+        elif conf >= 0.6:
+            conf_class = "confidence-medium"
+        else:
+            conf_class = "confidence-low"
+        st.markdown(f'<span class="{conf_class}">Confidence: {conf:.2f}</span>', unsafe_allow_html=True)
+    if show_timing and message.get("response_time"):
+        st.caption(f"⏱️ {message['response_time']:.2f}s")
+
+# Display chat messages
+for message in st.session_state.messages:
+    if message["role"] == "user":
+        with st.chat_message("user"):
+            st.markdown(message["content"])
+    else:
+        with st.chat_message("assistant"):
+            # Only show the answer
+            st.markdown(f"**Answer:**\n{message['content']}")
+            render_assistant_details(message)
 
 # Chat input
 user_input = st.chat_input("Ask me anything about the uploaded documents...")
@@ -111,28 +176,40 @@ if user_input:
         "content": user_input,
         "timestamp": time.time()
     })
+    with st.chat_message("user"):
+        st.markdown(user_input)
     
-    # Make API call
-    with st.spinner("🤔 Thinking..."):
+    # Stream the answer, rendering tokens as they arrive
+    with st.chat_message("assistant"):
+        answer_placeholder = st.empty()
+        answer_placeholder.markdown("🤔 Thinking...")
         try:
-            response = requests.post(
-                "http://127.0.0.1:8000/ask/",
-                json={"query": user_input},
-                headers={"Content-Type": "application/json"}
-            )
+            partial_answer = ""
+            data = None
+            for event in client.ask_stream(user_input):
+                if event["type"] == "token":
+                    partial_answer += event["text"]
+                    answer_placeholder.markdown(f"**Answer:**\n{partial_answer}▌")
+                elif event["type"] == "done":
+                    data = event
+                elif event["type"] == "error":
+                    st.error(f"❌ Error: {event['detail']}")
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Add assistant response to chat history
-                st.session_state.messages.append({
+            if data is not None:
+                # Replace the raw stream with the cleaned final answer
+                answer_placeholder.markdown(f"**Answer:**\n{data['answer']}")
+                message = {
                     "role": "assistant",
                     "content": data["answer"],
                     "sources": data.get("sources", ""),
                     "confidence": data.get("confidence", 0),
                     "response_time": data.get("response_time", 0),
                     "timestamp": time.time()
-                })
+                }
+                render_assistant_details(message)
+                
+                # Add assistant response to chat history
+                st.session_state.messages.append(message)
                 
                 # Update conversation statistics
                 stats = st.session_state.conversation_stats
@@ -146,49 +223,30 @@ if user_input:
                     / stats["total_queries"]
                 )
                 
-            else:
-                st.error(f"Error: {response.status_code}")
-                
         except requests.exceptions.ConnectionError:
+            answer_placeholder.empty()
             st.error("❌ Cannot connect to backend. Please ensure the backend server is running.")
+        except requests.exceptions.HTTPError as e:
+            answer_placeholder.empty()
+            st.error(f"Error: {e.response.status_code}")
         except Exception as e:
+            answer_placeholder.empty()
             st.error(f"❌ Error: {str(e)}")
 
-# Display chat messages
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        with st.chat_message("user"):
-            st.markdown(message["content"])
-    else:
-        with st.chat_message("assistant"):
-            # Only show the answer
-            st.markdown(f"**Answer:**\n{message['content']}")
-            # Show sources if enabled
-            if show_sources and message.get("sources"):
-                st.caption("📄 **Sources:**")
-                # Display sources as they come from backend (already deduplicated and formatted)
-                st.caption(message["sources"])
-            # Show confidence and timing if enabled
-            if show_confidence:
-                conf = message.get("confidence", 0)
-                if conf >= 0.8:
-                    conf_class = "confidence-high"
-                elif conf >= 0.6:
-                    conf_class = "confidence-medium"
-                else:
-                    conf_class = "confidence-low"
-                st.markdown(f'<span class="{conf_class}">Confidence: {conf:.2f}</span>', unsafe_allow_html=True)
-            if show_timing and message.get("response_time"):
-                st.caption(f"⏱️ {message['response_time']:.2f}s")
+# Display conversation statistics
+with col1:
+    st.metric("Total Queries", st.session_state.conversation_stats["total_queries"])
+with col2:
+    st.metric("Avg Response Time", f"{st.session_state.conversation_stats['avg_response_time']:.2f}s")
+with col3:
+    st.metric("Avg Confidence", f"{st.session_state.conversation_stats['avg_confidence']:.2f}")
 
 # Footer with system information
 with st.expander("🔧 System Information"):
-    try:
-        health_response = requests.get("http://127.0.0.1:8000/health/")
-        if health_response.status_code == 200:
-            health_data = health_response.json()
-            st.json(health_data)
-        else:
-            st.error("Backend health check failed")
-    except:
+    health = fetch_health(client)
+    if health["ok"]:
+        st.json(health["data"])
+    elif health["reachable"]:
+        st.error("Backend health check failed")
+    else:
         st.warning("Backend not accessible")